@@ -6,30 +6,322 @@ choose the type of conversion (EXR to JPG or TIF to JPG), and optionally
 remove the original files after conversion.
 '''
 
+from concurrent.futures import ProcessPoolExecutor
 from tkinter import filedialog, messagebox
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import threading
 import tkinter as tk
 import os
-import sys
-import subprocess
 
+from PIL import Image
+import Imath
+import numpy as np
+import OpenEXR
 
-def install_dependencies(package):
-    subprocess.check_call([sys.executable, '-m', 'pip', 'install', package])
+# Let OpenEXR's IlmThread pool decompress scanline blocks across cores.
+# The entry point moved between binding versions, so probe both homes.
+for _module in (OpenEXR, Imath):
+    if hasattr(_module, 'setGlobalThreadCount'):
+        _module.setGlobalThreadCount(os.cpu_count())
+        break
 
+# OpenImageIO decodes EXR multithreaded and hands back a ready-made
+# HxWx3 array; use it when available and fall back to OpenEXR/Imath.
+try:
+    import OpenImageIO as oiio
+except ImportError:
+    oiio = None
 
+# numba fuses the multiply/clip/cast into a single parallel SIMD pass
+# over the pixels, standing in for a hand-built C/OpenMP extension
+# without requiring a compile step at install time; without it the
+# NumPy in-place chain below is used.
 try:
-    from PIL import Image
-    import Imath
-    import numpy as np
-    import OpenEXR
+    from numba import njit, prange
 except ImportError:
-    packages = ['Imath', 'OpenEXR', 'Pillow']
-    for pack in packages:
-        install_dependencies(pack)
-    from PIL import Image
-    import Imath
-    import numpy as np
-    import OpenEXR
+    njit = None
+
+# libjpeg-turbo's SIMD encoder is 2-4x faster than Pillow's stock
+# libjpeg; when the native library is missing TurboJPEG() raises
+# RuntimeError (OSError on older PyTurboJPEG releases), in which case
+# encoding stays with Pillow.
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    _turbo = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    _turbo = None
+
+_PT_FLOAT = Imath.PixelType(Imath.PixelType.FLOAT)
+_RGB = ('R', 'G', 'B')
+
+log = logging.getLogger('convert_to_jpg')
+
+
+def _init_worker_logging(log_queue):
+    ''' Funnel worker log records to the parent's logging thread. '''
+    log.addHandler(logging.handlers.QueueHandler(log_queue))
+    log.setLevel(logging.INFO)
+
+
+# Rendered frame batches usually share one size, so recycle the big
+# working arrays instead of paying an mmap/munmap per np.empty on every
+# frame. Buffers are taken during decode/encode and given back once
+# the frame is written; the lock keeps the prefetch pipeline's two
+# in-flight frames from sharing a buffer.
+_buffer_pool = {}
+_buffer_lock = threading.Lock()
+
+
+def _take_buffer(key, shape, dtype):
+    with _buffer_lock:
+        stack = _buffer_pool.get(key)
+        if stack:
+            return stack.pop()
+    return np.empty(shape, dtype=dtype)
+
+
+def _give_buffer(key, array):
+    with _buffer_lock:
+        _buffer_pool.setdefault(key, []).append(array)
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _f32_to_u8_scaled(src, dst):
+        for i in prange(src.size):
+            dst[i] = min(255, max(0, int(src[i] * 255.0)))
+
+
+def _read_exr_oiio(exr_path):
+    ''' Decode an EXR file into an HxWx3 uint8 array via OpenImageIO. '''
+    source = oiio.ImageInput.open(exr_path)
+    if source is None:
+        raise OSError(f'{exr_path}: {oiio.geterror()}')
+    out = source.read_image(0, 0, 0, 3, 'uint8')
+    source.close()
+
+    # read_image clamps the channel range to what the file has, so a
+    # 2-channel EXR comes back HxWx2; zero-fill the absent channels
+    # like the OpenEXR path does.
+    if out.shape[-1] < 3:
+        padded = np.zeros(out.shape[:2] + (3,), dtype=np.uint8)
+        padded[..., :out.shape[-1]] = out
+        out = padded
+    return out
+
+
+def _read_exr_raw(exr_path):
+    ''' Read an EXR's raw float32 channel buffers plus (W, H). '''
+    file = OpenEXR.InputFile(exr_path)
+    dw = file.header()['dataWindow']
+    width = dw.max.x - dw.min.x + 1
+    height = dw.max.y - dw.min.y + 1
+
+    channels = set(file.header()['channels'])
+    present = [color for color in _RGB if color in channels]
+    buffers = dict(zip(present, file.channels(present, _PT_FLOAT)))
+    file.close()
+    return buffers, (width, height)
+
+
+def _raw_to_planes(buffers, size):
+    ''' Convert raw float32 channel buffers to flat uint8 planes.
+
+    Must run on the main thread: the numba kernel is parallel=True,
+    and launching a parallel kernel from a worker thread leaves the
+    interpreter unable to shut down.
+    '''
+    width, height = size
+    planes = []
+    tmp = _take_buffer(('tmp', width, height), height * width, np.float32)
+    for color in _RGB:
+        plane = _take_buffer(('plane', width, height),
+                             height * width, np.uint8)
+        if color not in buffers:
+            plane[:] = 0
+            planes.append(plane)
+            continue
+        channel = np.frombuffer(buffers[color], dtype=np.float32)
+        if njit is not None:
+            _f32_to_u8_scaled(channel, plane)
+        else:
+            np.multiply(channel, 255.0, out=tmp)
+            np.clip(tmp, 0, 255, out=tmp)
+            plane[:] = tmp
+        planes.append(plane)
+    _give_buffer(('tmp', width, height), tmp)
+    return planes
+
+
+def _read_exr_planes(exr_path):
+    ''' Decode an EXR file into three flat uint8 planes plus (W, H). '''
+    buffers, size = _read_exr_raw(exr_path)
+    return _raw_to_planes(buffers, size), size
+
+
+def _decode_exr(exr_path):
+    ''' Decode an EXR as (packed, planes, size); one side is None. '''
+    if oiio is not None:
+        # Pillow's JPEG encoder takes a slow per-row copy path on
+        # non-contiguous input, so normalize whatever OpenImageIO
+        # hands back.
+        return np.ascontiguousarray(_read_exr_oiio(exr_path)), None, None
+    planes, size = _read_exr_planes(exr_path)
+    return None, planes, size
+
+
+def _encode_jpg(jpg_path, out, planes, size):
+    ''' Encode a decoded frame (packed or planar) to jpg_path. '''
+    if _turbo is not None:
+        if out is None:
+            # TurboJPEG's only planar entry points take YUV planes
+            # (tjCompressFromYUVPlanes), so RGB planes cannot skip
+            # this step; one interleave pass into a pooled buffer is
+            # far cheaper than the encode-time the turbo path saves.
+            width, height = size
+            out = _take_buffer(('packed', width, height),
+                               (height, width, 3), np.uint8)
+            for index, plane in enumerate(planes):
+                out[..., index] = plane.reshape(height, width)
+            packed_key = ('packed', width, height)
+        else:
+            packed_key = None
+        with open(jpg_path, 'wb') as handle:
+            handle.write(
+                _turbo.encode(out, quality=90, pixel_format=TJPF_RGB))
+        if packed_key is not None:
+            _give_buffer(packed_key, out)
+    elif out is not None:
+        # Pillow still copies RGB input (its zero-copy frombuffer path
+        # covers only L/RGBX/RGBA/CMYK); frombuffer just skips
+        # fromarray's mode inference here.
+        height, width = out.shape[:2]
+        img = Image.frombuffer('RGB', (width, height), out,
+                               'raw', 'RGB', 0, 1)
+        img.save(jpg_path, 'JPEG', quality=90, subsampling=2,
+                 optimize=False, progressive=False)
+    else:
+        # The planes stay in EXR's native planar layout; libjpeg does
+        # the interleave in C during encode.
+        bands = [Image.frombuffer('L', size, plane, 'raw', 'L', 0, 1)
+                 for plane in planes]
+        Image.merge('RGB', bands).save(jpg_path, 'JPEG', quality=90,
+                                       subsampling=2, optimize=False,
+                                       progressive=False)
+
+    # The planes' last reader is the encode above; hand them back for
+    # the next same-size frame.
+    if planes is not None:
+        width, height = size
+        for plane in planes:
+            _give_buffer(('plane', width, height), plane)
+
+
+def convert_exr_to_jpg(exr_path, remove_original=False):
+    jpg_path = os.path.splitext(exr_path)[0] + '.jpg'
+    out, planes, size = _decode_exr(exr_path)
+    _encode_jpg(jpg_path, out, planes, size)
+    log.info('\t | %s has been converted.', exr_path)
+
+    if remove_original:
+        os.remove(exr_path)
+    return jpg_path
+
+
+def _convert_exr_batch_pipelined(exr_paths):
+    ''' Convert EXRs with the next decode overlapping the current encode.
+
+    The decoders release the GIL in C++ while decompressing, so a
+    plain producer thread feeding a short queue hides roughly one
+    stage's latency per frame without any process overhead. The
+    producer only reads; the uint8 conversion happens in the consumer
+    because _raw_to_planes must stay on the main thread.
+    '''
+    decoded = queue.Queue(maxsize=2)
+
+    def produce():
+        for path in exr_paths:
+            try:
+                if oiio is not None:
+                    item = (path,
+                            np.ascontiguousarray(_read_exr_oiio(path)),
+                            None, None)
+                else:
+                    buffers, size = _read_exr_raw(path)
+                    item = (path, None, buffers, size)
+            except Exception as error:
+                decoded.put(error)
+                return
+            decoded.put(item)
+        decoded.put(None)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = decoded.get()
+        if item is None:
+            break
+        if isinstance(item, Exception):
+            raise item
+        path, out, buffers, size = item
+        planes = None if out is not None else _raw_to_planes(buffers, size)
+        _encode_jpg(os.path.splitext(path)[0] + '.jpg', out, planes, size)
+        log.info('\t | %s has been converted.', path)
+
+
+def _copy_jpeg_strip(image, jpg_path):
+    ''' Copy the JPEG payload out of a JPEG-in-TIFF without re-encoding.
+
+    Only handles the self-contained case: new-style JPEG compression
+    (tag 259 == 7), RGB or YCbCr photometric, a single strip and no
+    shared JPEGTables tag. Returns True when the copy was made.
+    '''
+    tags = image.tag_v2
+    if tags.get(259) != 7 or tags.get(262) not in (2, 6):
+        return False
+    offsets = tags.get(273)
+    counts = tags.get(279)
+    if 347 in tags or not offsets or len(offsets) != 1:
+        return False
+
+    image.fp.seek(offsets[0])
+    data = image.fp.read(counts[0])
+    if not data.startswith(b'\xff\xd8'):
+        return False
+    with open(jpg_path, 'wb') as handle:
+        handle.write(data)
+    return True
+
+
+def convert_tif_to_jpg(tif_path, remove_original=False):
+    image = Image.open(tif_path)
+
+    # TIFFs with JPEG-compressed strips already hold a finished JPEG
+    # stream; copy it out instead of burning a decode+encode round
+    # trip (which would also recompress lossily).
+    jpg_path = os.path.splitext(tif_path)[0] + '.jpg'
+    if hasattr(image, 'tag_v2') and _copy_jpeg_strip(image, jpg_path):
+        log.info('\t | %s has been converted.', tif_path)
+        if remove_original:
+            os.remove(tif_path)
+        return jpg_path
+
+    # Ask the codec to decode straight to RGB where it can, so
+    # convert() below becomes a no-op instead of a second full-size
+    # buffer for 16-bit/CMYK sources.
+    image.draft('RGB', image.size)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    image.save(jpg_path, 'JPEG', quality=90, subsampling=2,
+               optimize=False, progressive=False)
+
+    log.info('\t | %s has been converted.', tif_path)
+    if remove_original:
+        os.remove(tif_path)
+    return jpg_path
 
 
 class ImageConverter():
@@ -89,84 +381,58 @@ class ImageConverter():
 
     def get_files(self):
         self.file_paths = filedialog.askopenfilenames(
+            parent=self.root,
             title='Select files')
         return self.file_paths
 
 
-    def convert_exr_to_jpg(self, exr_path, remove_original=False):
-        file = OpenEXR.InputFile(exr_path)
-        dw = file.header()['dataWindow']
-        size = (dw.max.x - dw.min.x + 1, dw.max.y - dw.min.y + 1)
-
-        channels = file.header()['channels'].keys()
-        required_channels = ['R', 'G', 'B']
-
-        rgb = []
-        pt = Imath.PixelType(Imath.PixelType.FLOAT)
-        for color in required_channels:
-            if color in channels:
-                channel_data = np.frombuffer(file.channel(color, pt), 
-                                            dtype=np.float32)
-            else:
-                channel_data = np.zeros(size[0] * size[1], dtype=np.float32)
-            rgb.append(channel_data)
-        r, g, b = [im.reshape(size) for im in rgb]
-
-        img = np.stack([r, g, b], axis=-1)
-        img = np.clip(img * 255, 0, 255).astype(np.uint8)
-
-        jpg_path = os.path.splitext(exr_path)[0] + '.jpg'
-        img = Image.fromarray(img)
-        img.save(jpg_path, 'JPEG')
-        file.close()
-        print(f'\t | {exr_path} has been converted.')
-
-        if remove_original:
-            os.remove(exr_path)
-        return jpg_path
-    
-    
-    def convert_tif_to_jpg(self, tif_path, remove_original=False):
-        image = Image.open(tif_path)
-
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-
-        jpg_path = os.path.splitext(tif_path)[0] + '.jpg'
-        image.save(jpg_path ,'JPEG')
-
-        print(f'\t | {tif_path} has been converted.')
-        if remove_original:
-            os.remove(tif_path)
-        return jpg_path
-
-
-    def uninstall_dependencies(self):
-        packages = ['Imath', 'OpenEXR', 'Pillow']
-        for pack in packages:
-            subprocess.check_call(
-                [sys.executable, '-m', 'pip', 'uninstall', '-y', pack])
-        return packages
-
-
     def run(self):
         source_type = self.conversion_type.get()
         remove_original = self.remove_var.get()
 
         if not self.file_paths:
             messagebox.showwarning(
-                'No files selected. Please select files to convert.')
-
-        print(f'\n Converting images:')
-        for file in self.file_paths:
-            if source_type == 'exr':
-                self.convert_exr_to_jpg(
-                        file, remove_original=remove_original)
-            elif source_type == 'tif':
-                self.convert_tif_to_jpg(
-                        file, remove_original=remove_original)
-        messagebox.showinfo('\nConversion Complete\n')
-        self.uninstall_dependencies()
+                'No files selected. Please select files to convert.',
+                parent=self.root)
+
+        if source_type == 'exr':
+            convert = convert_exr_to_jpg
+        else:
+            convert = convert_tif_to_jpg
+
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+        log.info('\n Converting images:')
+        if source_type == 'exr' and len(self.file_paths) <= os.cpu_count():
+            # A handful of large frames doesn't amortize process
+            # spawning; overlap decode and encode in-process instead.
+            _convert_exr_batch_pipelined(self.file_paths)
+        else:
+            context = multiprocessing.get_context('spawn')
+            # Workers log through a queue drained by a single listener
+            # thread here, so stdout writes never serialize the pool.
+            log_queue = context.Queue()
+            listener = logging.handlers.QueueListener(
+                log_queue, *logging.getLogger().handlers)
+            listener.start()
+            try:
+                with ProcessPoolExecutor(max_workers=os.cpu_count(),
+                                         mp_context=context,
+                                         initializer=_init_worker_logging,
+                                         initargs=(log_queue,)) as executor:
+                    list(executor.map(convert, self.file_paths, chunksize=4))
+            finally:
+                listener.stop()
+
+        # Unlink originals in one batch off the GUI thread, and only
+        # once every conversion has succeeded, so a failed encode never
+        # costs a source file and per-file metadata flushes don't stall
+        # the hot loop.
+        if remove_original:
+            to_remove = list(self.file_paths)
+            threading.Thread(
+                target=lambda: [os.unlink(path) for path in to_remove],
+                daemon=True).start()
+        messagebox.showinfo('\nConversion Complete\n', parent=self.root)
 
 
 if __name__ == '__main__':